@@ -2,7 +2,8 @@ import os
 
 bind = f"0.0.0.0:{os.getenv('PORT', '8081')}"
 workers = int(os.getenv('WORKERS', '4'))
-worker_class = "sync"
+worker_class = "gevent"
+worker_connections = int(os.getenv('WORKER_CONNECTIONS', '500'))
 timeout = 120
 keepalive = 5
 max_requests = 1000
@@ -12,4 +13,26 @@ errorlog = "-"
 loglevel = os.getenv('LOG_LEVEL', 'info')
 
 
+def on_starting(server):
+    # Create tables and ingest data once in the master, before workers fork
+    import bootstrap
+    bootstrap.main()
 
+
+def post_fork(server, worker):
+    # Make libpq waits cooperative so one worker can overlap many DB queries
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
+
+
+def post_worker_init(worker):
+    # Connection pools cannot be shared across fork; each worker builds its own.
+    # This runs after gevent has patched threading, so the pool's locks are gevent-aware.
+    import db_pool
+    db_pool.reset_pool()
+
+    # Open the worker's connection pool at boot rather than on its first request
+    try:
+        db_pool.get_pool()
+    except Exception as e:
+        worker.log.warning("Could not open database connection pool: %s", e)
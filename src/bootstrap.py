@@ -0,0 +1,45 @@
+import os
+import data_modeling
+import data_wrangling
+
+
+def main():
+    """
+    Create tables and ingest the weather and yield data files.
+    Runs once at container start from the gunicorn master (see gunicorn_config.py),
+    or manually with `python -m bootstrap` from the src directory. A manual run
+    does not refresh the caches or ETags of a running server; restart gunicorn
+    to serve newly ingested data.
+    """
+    try:
+        conn = data_modeling.get_db_connection()
+        data_modeling.initialize_tables(conn)
+        
+        # Data folders live next to the src directory
+        src_dir = os.path.dirname(os.path.abspath(__file__))
+        src_dir = os.path.dirname(src_dir)
+        
+        # Ingest weather data
+        wx_data_path = os.path.join(src_dir, "wx_data")
+        weather_success = data_wrangling.ingest_weather_data(wx_data_path)
+        if weather_success:
+            print("Weather data ingestion completed successfully.")
+        else:
+            print("Weather data ingestion failed.")
+        
+        # Ingest yield data
+        yld_data_path = os.path.join(src_dir, "yld_data", "US_corn_grain_yield.txt")
+        yield_success = data_wrangling.ingest_yield_data(yld_data_path)
+        if yield_success:
+            print("Yield data ingestion completed successfully.")
+        else:
+            print("Yield data ingestion failed.")
+        
+        # Weather stats are refreshed as part of the weather data ingestion
+        conn.close()
+    except Exception as e:
+        print(f"Error: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,71 @@
 import os
 import time
+import functools
+import itertools
 import pandas as pd
 import psycopg2
 import configparser
 import psycopg2.extras as extras
-from psycopg2 import sql
 from psycopg2.extensions import register_adapter, AsIs
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterator, Optional, Union
 from dotenv import load_dotenv
+from db_pool import get_pool
 
 # Load environment variables
 load_dotenv()
 
-
-def get_db_connection():
+# Schema for all tables, executed in a single round-trip by initialize_tables
+TABLES_DDL = """
+    -- Table for raw daily weather observations
+    CREATE TABLE IF NOT EXISTS weather_data (
+        record_date        DATE        NOT NULL,
+        max_temp           SMALLINT,    -- tenths of degrees Celsius
+        min_temp           SMALLINT,    -- tenths of degrees Celsius
+        precipitation      INTEGER,     -- tenths of millimeters
+        weather_station    CHAR(11)    NOT NULL,
+        PRIMARY KEY (record_date, weather_station)
+    );
+
+    -- Annual crop yield information
+    CREATE TABLE IF NOT EXISTS yield_data (
+        record_year   SMALLINT    NOT NULL,
+        total_yield   INTEGER     NOT NULL,
+        PRIMARY KEY (record_year)
+    );
+
+    -- Logging table for ETL weather ingestion runs
+    CREATE TABLE IF NOT EXISTS weather_logs (
+        start_time        TIMESTAMP    NOT NULL,
+        end_time          TIMESTAMP    NOT NULL,
+        records           INTEGER      NOT NULL,
+        weather_station   CHAR(11)     NOT NULL
+    );
+
+    -- Aggregated annual stats per station
+    CREATE TABLE IF NOT EXISTS weather_stats (
+        weather_station      CHAR(11)   NOT NULL,
+        record_year          SMALLINT   NOT NULL,
+        avg_min_temp         DOUBLE PRECISION,
+        avg_max_temp         DOUBLE PRECISION,
+        avg_precipitation    INTEGER,
+        PRIMARY KEY (record_year, weather_station)
+    );
+
+    -- Station-filtered API queries; the primary keys lead with the date/year
+    CREATE INDEX IF NOT EXISTS weather_data_station_date_idx
+        ON weather_data (weather_station, record_date);
+    CREATE INDEX IF NOT EXISTS weather_stats_station_year_idx
+        ON weather_stats (weather_station, record_year);
+"""
+
+
+def _resolve_conn_kwargs() -> Optional[Dict]:
     """
-    Create and return a database connection using config.ini or environment variables.
+    Resolve database connection parameters from config.ini or environment variables.
     Environment variables take precedence over config.ini.
-    
+
     Returns:
-        psycopg2.connection: Database connection object
+        dict: Keyword arguments for psycopg2.connect, or None if not configured
     """
     # Try environment variables first (for Docker/production)
     db_host = os.getenv('DB_HOST')
@@ -42,24 +88,50 @@ def get_db_connection():
             db_port = db_port or db_cfg.get("port")
     
     if not all([db_host, db_user, db_password, db_name]):
+        return None
+
+    return {
+        "host": db_host,
+        "user": db_user,
+        "password": db_password,
+        "dbname": db_name,
+        "port": db_port,
+    }
+
+
+# Resolved once at import instead of re-reading env/config.ini per connection
+_CONN_KWARGS = _resolve_conn_kwargs()
+
+
+def get_db_config() -> Dict:
+    """
+    Return the database connection parameters resolved at import time.
+
+    Returns:
+        dict: Keyword arguments for psycopg2.connect
+    """
+    if _CONN_KWARGS is None:
         raise ValueError("Database configuration not found. Set environment variables or config.ini")
-    
-    connection = psycopg2.connect(
-        host=db_host,
-        user=db_user,
-        password=db_password,
-        dbname=db_name,
-        port=db_port
-    )
+    return _CONN_KWARGS
 
-    return connection
+
+def get_db_connection():
+    """
+    Create and return a new (unpooled) database connection.
+    Used by one-shot tasks such as table initialization and ingestion;
+    API queries borrow connections from db_pool instead.
+    
+    Returns:
+        psycopg2.connection: Database connection object
+    """
+    return psycopg2.connect(**get_db_config())
 
 
 def initialize_tables(conn):
     """
     Create all required tables if they do not already exist.
-    Uses PostgreSQL advisory locks to prevent race conditions when multiple
-    workers try to initialize tables concurrently.
+    Uses a transaction-level PostgreSQL advisory lock to serialize concurrent
+    initialization by multiple workers.
     Note: This function does NOT drop existing tables to preserve data.
     For a fresh start, manually drop tables or use initialize_tables_fresh().
     
@@ -70,102 +142,201 @@ def initialize_tables(conn):
     # Lock ID: 123456 (arbitrary but consistent)
     lock_id = 123456
     
-    with conn.cursor() as cur:
-        # Try to acquire advisory lock (non-blocking)
-        cur.execute("SELECT pg_try_advisory_lock(%s)", (lock_id,))
-        lock_acquired = cur.fetchone()[0]
-        
-        if not lock_acquired:
-            # Another process is initializing, wait a bit and check if tables exist
-            time.sleep(0.5)
-            cur.execute("""
-                SELECT EXISTS (
-                    SELECT FROM information_schema.tables 
-                    WHERE table_schema = 'public' 
-                    AND table_name = 'weather_data'
-                )
-            """)
-            table_exists = cur.fetchone()[0]
-            if table_exists:
-                print("Tables already initialized by another process, skipping...")
-                return
-            # If tables don't exist, wait for lock (blocking)
-            cur.execute("SELECT pg_advisory_lock(%s)", (lock_id,))
-            lock_acquired = True
-        
-        try:
-            print("creating tables -----------------")
-            # Table for raw daily weather observations
-            cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS weather_data (
-                    record_date        DATE        NOT NULL,
-                    max_temp           NUMERIC,
-                    min_temp           NUMERIC,
-                    precipitation      NUMERIC,
-                    weather_station    CHAR(11)    NOT NULL,
-                    PRIMARY KEY (record_date, weather_station)
-                );
-                """
-            )
-
-            # Annual crop yield information
-            cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS yield_data (
-                    record_year   SMALLINT    NOT NULL,
-                    total_yield   INTEGER     NOT NULL,
-                    PRIMARY KEY (record_year)
-                );
-                """
-            )
-
-            # Logging table for ETL weather ingestion runs
-            cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS weather_logs (
-                    start_time        TIMESTAMP    NOT NULL,
-                    end_time          TIMESTAMP    NOT NULL,
-                    records           INTEGER      NOT NULL,
-                    weather_station   CHAR(11)     NOT NULL
-                );
-                """
-            )
-
-            # Aggregated annual stats per station
-            cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS weather_stats (
-                    weather_station      CHAR(11)   NOT NULL,
-                    record_year          SMALLINT   NOT NULL,
-                    avg_min_temp         NUMERIC,
-                    avg_max_temp         NUMERIC,
-                    avg_precipitation    NUMERIC,
-                    PRIMARY KEY (record_year, weather_station)
-                );
-                """
-            )
+    # The connection context commits on success and rolls back on error,
+    # which also releases the transaction-level lock
+    with conn, conn.cursor() as cur:
+        # Blocks until any concurrent initializer has committed its DDL
+        cur.execute("SELECT pg_advisory_xact_lock(%s)", (lock_id,))
 
-            conn.commit()
-        except psycopg2.Error as e:
-            # If error is about duplicate type/table, it's likely a race condition
-            # that was resolved by another process - this is acceptable
-            if "duplicate key value violates unique constraint" in str(e) or \
-               "already exists" in str(e).lower():
-                print(f"Table initialization conflict (likely resolved by another process): {e}")
-                conn.rollback()
-            else:
-                # Re-raise other errors
-                conn.rollback()
-                raise
+        print("creating tables -----------------")
+        # All DDL is sent as one multi-statement query (single round-trip)
+        cur.execute(TABLES_DDL)
+
+
+def _build_queries(select: str, filters: List[str], keyset: str, order_by: str) -> Dict[tuple, str]:
+    """
+    Precompose every filter combination of a paginated API query.
+    Keys are tuples of booleans: one per filter (in order), then whether
+    keyset pagination is used instead of OFFSET.
+
+    Args:
+        select (str): SELECT ... FROM ... part of the query
+        filters (list of str): Optional WHERE conditions, each with one placeholder
+        keyset (str): Keyset pagination condition
+        order_by (str): ORDER BY column list
+
+    Returns:
+        dict: Query string for each combination of flags
+    """
+    queries = {}
+    for flags in itertools.product((False, True), repeat=len(filters) + 1):
+        *filter_flags, use_keyset = flags
+        query = select + " WHERE 1=1"
+        for condition, enabled in zip(filters, filter_flags):
+            if enabled:
+                query += " AND " + condition
+        if use_keyset:
+            query += " AND " + keyset + " ORDER BY " + order_by + " LIMIT %s"
+        else:
+            query += " ORDER BY " + order_by + " LIMIT %s OFFSET %s"
+        queries[flags] = query
+    return queries
+
+
+# API queries are built once at import instead of per request.
+# Unit conversion is done in float8 so rows come back as Python floats, not Decimal.
+_WEATHER_QUERIES = _build_queries(
+    "SELECT record_date, "
+    "max_temp::float8 / 10 as max_temp, "
+    "min_temp::float8 / 10 as min_temp, "
+    "precipitation::float8 / 100 as precipitation, "
+    "weather_station "
+    "FROM weather_data",
+    ["weather_station = %s", "record_date = %s"],
+    "(record_date, weather_station) > (%s, %s)",
+    "record_date, weather_station",
+)
+
+_STATS_QUERIES = _build_queries(
+    "SELECT weather_station, record_year, "
+    "avg_min_temp::float8 / 10 as avg_min_temp, "
+    "avg_max_temp::float8 / 10 as avg_max_temp, "
+    "avg_precipitation::float8 / 100 as avg_precipitation "
+    "FROM weather_stats",
+    ["weather_station = %s", "record_year = %s"],
+    "(record_year, weather_station) > (%s, %s)",
+    "record_year, weather_station",
+)
+
+_YIELD_QUERIES = _build_queries(
+    "SELECT record_year, total_yield FROM yield_data",
+    ["record_year = %s"],
+    "record_year > %s",
+    "record_year",
+)
+
+
+# Rows fetched per round-trip when streaming from a server-side cursor
+STREAM_ITERSIZE = 10_000
+
+
+# Only pages of up to QUERY_CACHE_MAX_ROWS rows are kept in the in-process cache,
+# so it holds at most QUERY_CACHE_SIZE * QUERY_CACHE_MAX_ROWS rows (a few MB)
+# per worker. Larger pages are still cached, already encoded, by Flask-Caching.
+QUERY_CACHE_SIZE = 256
+QUERY_CACHE_MAX_ROWS = 100
+
+
+def _run_query(query: str, params: tuple) -> tuple:
+    """
+    Run a read-only API query on a pooled connection.
+
+    Args:
+        query (str): One of the precomposed API queries
+        params (tuple): Query parameters
+
+    Returns:
+        tuple of dict: Result rows
+    """
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        with conn.cursor(cursor_factory=extras.RealDictCursor) as cur:
+            cur.execute(query, params)
+            # RealDictCursor builds the row dicts in psycopg2's C code
+            return tuple(cur.fetchall())
+    finally:
+        pool.putconn(conn)
+
+
+@functools.lru_cache(maxsize=QUERY_CACHE_SIZE)
+def _cached_query(query: str, params: tuple) -> tuple:
+    """
+    Run a small API query through _run_query and cache the result.
+    Historical data only changes on ingestion, so identical (query, params)
+    pairs are answered from memory until clear_query_cache() is called.
+    Errors propagate and are therefore never cached.
+
+    Returns:
+        tuple of dict: Result rows (shared between callers; do not mutate)
+    """
+    return _run_query(query, params)
+
+
+def _fetch_page(query: str, params: tuple, limit: int) -> List[Dict]:
+    """
+    Fetch one page of an API query, from the query cache if the page is small.
+
+    Args:
+        query (str): One of the precomposed API queries
+        params (tuple): Query parameters
+        limit (int): Page size; pages above QUERY_CACHE_MAX_ROWS are not cached
+
+    Returns:
+        list of dict: Result rows
+    """
+    if limit <= QUERY_CACHE_MAX_ROWS:
+        return list(_cached_query(query, params))
+    return list(_run_query(query, params))
+
+
+def _stream_query(query: str, params: tuple) -> Iterator[Dict]:
+    """
+    Run an API query through a server-side cursor and yield rows in batches
+    of STREAM_ITERSIZE. The pooled connection is held until the generator is
+    exhausted or closed. Yields a single None first, once the query has been
+    sent, so that _start_stream can surface database errors eagerly.
+    """
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        # Pooled connections are in autocommit mode, but named cursors
+        # only exist inside a transaction
+        conn.autocommit = False
+        with conn.cursor(name="api_stream", cursor_factory=extras.RealDictCursor) as cur:
+            cur.itersize = STREAM_ITERSIZE
+            cur.execute(query, params)
+            yield None
+            yield from cur
+    finally:
+        try:
+            conn.rollback()
+            conn.autocommit = True
         finally:
-            # Release the advisory lock
-            if lock_acquired:
-                cur.execute("SELECT pg_advisory_unlock(%s)", (lock_id,))
-                conn.commit()
+            pool.putconn(conn)
 
 
-def get_weather_data(station_id: str = "", date_val: str = "", offset: int = 1, limit: int = 1000) -> List[Dict]:
+def _start_stream(query: str, params: tuple) -> Iterator[Dict]:
+    """
+    Start a streaming query and return an iterator over its rows.
+    The query is executed before returning, so errors are raised here rather
+    than from the first iteration, and closing the iterator early still
+    returns the connection to the pool.
+    """
+    rows = _stream_query(query, params)
+    next(rows)
+    return rows
+
+
+# Identifies the data currently in the database, for HTTP ETags. Bumped by
+# clear_query_cache; ingestion runs in the gunicorn master before it forks,
+# so all workers inherit the same value.
+ingest_version = str(time.time_ns())
+
+
+def clear_query_cache():
+    """
+    Drop all cached API query results in this process and bump ingest_version.
+    Called after ingestion or stats calculation commits new data.
+    """
+    global ingest_version
+    _cached_query.cache_clear()
+    ingest_version = str(time.time_ns())
+
+
+def get_weather_data(station_id: str = "", date_val: str = "", offset: int = 1, limit: int = 1000,
+                     after_date: str = "", after_station: str = "",
+                     stream: bool = False) -> Union[List[Dict], Iterator[Dict]]:
     """
     Fetch weather data from the database with optional filters and pagination.
     Temperatures are returned in degrees Celsius (converted from tenths).
@@ -176,59 +347,41 @@ def get_weather_data(station_id: str = "", date_val: str = "", offset: int = 1,
         date_val (str): Filter by specific date (YYYY-MM-DD)
         offset (int): Page number (1-indexed)
         limit (int): Number of records per page
+        after_date (str): Keyset pagination - record_date of the last row already seen
+        after_station (str): Keyset pagination - weather_station of the last row already seen.
+            When both after_* values are given, offset is ignored.
+        stream (bool): If True, bypass the cache and return an iterator that
+            streams rows from a server-side cursor instead of a list
 
     Returns:
         list of dict: List of weather records with converted units
     """
-    records = []
-    conn = None
-    try:
-        conn = get_db_connection()
-        with conn.cursor() as cur:
-            query = sql.SQL(
-                "SELECT record_date, "
-                "max_temp / 10.0 as max_temp, "
-                "min_temp / 10.0 as min_temp, "
-                "precipitation / 100.0 as precipitation, "
-                "weather_station "
-                "FROM weather_data WHERE 1=1"
-            )
-
-            params = []
-
-            if station_id:
-                query += sql.SQL(" AND weather_station = %s")
-                params.append(station_id)
-
-            if date_val:
-                query += sql.SQL(" AND record_date = %s")
-                params.append(date_val)
-
-            # Pagination
-            offset_value = (offset - 1) * limit
-            query += sql.SQL(" ORDER BY record_date, weather_station LIMIT %s OFFSET %s")
-            params.extend([limit, offset_value])
+    use_keyset = bool(after_date and after_station)
+    query = _WEATHER_QUERIES[(bool(station_id), bool(date_val), use_keyset)]
 
-            cur.execute(query, params)
-            rows = cur.fetchall()
+    params = []
+    if station_id:
+        params.append(station_id)
+    if date_val:
+        params.append(date_val)
 
-            # Convert to list of dicts
-            columns = [desc[0] for desc in cur.description]
-            for row in rows:
-                records.append(dict(zip(columns, row)))
+    if use_keyset:
+        params.extend([after_date, after_station, limit])
+    else:
+        params.extend([limit, (offset - 1) * limit])
 
+    try:
+        if stream:
+            return _start_stream(query, tuple(params))
+        return _fetch_page(query, tuple(params), limit)
     except psycopg2.Error as e:
         print(f"Database error in get_weather_data: {e}")
-        if conn:
-            conn.rollback()
-    finally:
-        if conn:
-            conn.close()
+        return []
 
-    return records
 
-
-def get_weather_stats(station_id: str = "", year_val: int = 0, offset: int = 1, limit: int = 500) -> List[Dict]:
+def get_weather_stats(station_id: str = "", year_val: int = 0, offset: int = 1, limit: int = 500,
+                      after_year: int = 0, after_station: str = "",
+                      stream: bool = False) -> Union[List[Dict], Iterator[Dict]]:
     """
     Fetch weather statistics from the database with optional filters and pagination.
     Temperatures are returned in degrees Celsius.
@@ -239,58 +392,40 @@ def get_weather_stats(station_id: str = "", year_val: int = 0, offset: int = 1,
         year_val (int): Filter by specific year
         offset (int): Page number (1-indexed)
         limit (int): Number of records per page
+        after_year (int): Keyset pagination - record_year of the last row already seen
+        after_station (str): Keyset pagination - weather_station of the last row already seen.
+            When both after_* values are given, offset is ignored.
+        stream (bool): If True, bypass the cache and return an iterator that
+            streams rows from a server-side cursor instead of a list
 
     Returns:
         list of dict: List of weather statistics records
     """
-    records = []
-    conn = None
-    try:
-        conn = get_db_connection()
-        with conn.cursor() as cur:
-            query = sql.SQL(
-                "SELECT weather_station, record_year, "
-                "avg_min_temp / 10.0 as avg_min_temp, "
-                "avg_max_temp / 10.0 as avg_max_temp, "
-                "avg_precipitation / 100.0 as avg_precipitation "
-                "FROM weather_stats WHERE 1=1"
-            )
+    use_keyset = bool(after_year and after_station)
+    query = _STATS_QUERIES[(bool(station_id), bool(year_val), use_keyset)]
 
-            params = []
+    params = []
+    if station_id:
+        params.append(station_id)
+    if year_val:
+        params.append(year_val)
 
-            if station_id:
-                query += sql.SQL(" AND weather_station = %s")
-                params.append(station_id)
-
-            if year_val:
-                query += sql.SQL(" AND record_year = %s")
-                params.append(year_val)
-
-            # Pagination
-            offset_value = (offset - 1) * limit
-            query += sql.SQL(" ORDER BY record_year, weather_station LIMIT %s OFFSET %s")
-            params.extend([limit, offset_value])
-
-            cur.execute(query, params)
-            rows = cur.fetchall()
-
-            # Convert to list of dicts
-            columns = [desc[0] for desc in cur.description]
-            for row in rows:
-                records.append(dict(zip(columns, row)))
+    if use_keyset:
+        params.extend([after_year, after_station, limit])
+    else:
+        params.extend([limit, (offset - 1) * limit])
 
+    try:
+        if stream:
+            return _start_stream(query, tuple(params))
+        return _fetch_page(query, tuple(params), limit)
     except psycopg2.Error as e:
         print(f"Database error in get_weather_stats: {e}")
-        if conn:
-            conn.rollback()
-    finally:
-        if conn:
-            conn.close()
-
-    return records
+        return []
 
 
-def get_yield_data(year_val: int = 0, offset: int = 1, limit: int = 5) -> List[Dict]:
+def get_yield_data(year_val: int = 0, offset: int = 1, limit: int = 5, after_year: int = 0,
+                   stream: bool = False) -> Union[List[Dict], Iterator[Dict]]:
     """
     Fetch yield data from the database with optional filters and pagination.
 
@@ -298,44 +433,33 @@ def get_yield_data(year_val: int = 0, offset: int = 1, limit: int = 5) -> List[D
         year_val (int): Filter by specific year
         offset (int): Page number (1-indexed)
         limit (int): Number of records per page
+        after_year (int): Keyset pagination - record_year of the last row already seen.
+            When given, offset is ignored.
+        stream (bool): If True, bypass the cache and return an iterator that
+            streams rows from a server-side cursor instead of a list
 
     Returns:
         list of dict: List of yield records
     """
-    records = []
-    conn = None
-    try:
-        conn = get_db_connection()
-        with conn.cursor() as cur:
-            query = sql.SQL("SELECT record_year, total_yield FROM yield_data WHERE 1=1")
-            params = []
-
-            if year_val:
-                query += sql.SQL(" AND record_year = %s")
-                params.append(year_val)
+    use_keyset = bool(after_year)
+    query = _YIELD_QUERIES[(bool(year_val), use_keyset)]
 
-            # Pagination
-            offset_value = (offset - 1) * limit
-            query += sql.SQL(" ORDER BY record_year LIMIT %s OFFSET %s")
-            params.extend([limit, offset_value])
+    params = []
+    if year_val:
+        params.append(year_val)
 
-            cur.execute(query, params)
-            rows = cur.fetchall()
-
-            # Convert to list of dicts
-            columns = [desc[0] for desc in cur.description]
-            for row in rows:
-                records.append(dict(zip(columns, row)))
+    if use_keyset:
+        params.extend([after_year, limit])
+    else:
+        params.extend([limit, (offset - 1) * limit])
 
+    try:
+        if stream:
+            return _start_stream(query, tuple(params))
+        return _fetch_page(query, tuple(params), limit)
     except psycopg2.Error as e:
         print(f"Database error in get_yield_data: {e}")
-        if conn:
-            conn.rollback()
-    finally:
-        if conn:
-            conn.close()
-
-    return records
+        return []
 
 
 def calculate_weather_stats(conn) -> bool:
@@ -377,6 +501,7 @@ def calculate_weather_stats(conn) -> bool:
             """
             cur.execute(query)
             conn.commit()
+            clear_query_cache()
             print("Weather statistics calculated and stored successfully.")
             return True
     except psycopg2.Error as e:
@@ -1,64 +1,207 @@
+import io
 import os
 import glob
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
 from datetime import datetime
 import psycopg2
 from psycopg2 import extras, sql
-from data_modeling import get_db_connection
+from psycopg2.extensions import register_adapter, AsIs
+from data_modeling import get_db_connection, clear_query_cache
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:  # pyarrow is optional; pandas' CSV writer is used instead
+    pa = None
+
+# Nullable integer columns yield numpy scalars and pd.NA, which psycopg2
+# cannot adapt out of the box
+register_adapter(np.int32, AsIs)
+register_adapter(np.int64, AsIs)
+register_adapter(type(pd.NA), lambda _: AsIs("NULL"))
+
+# Weather batches larger than this are serialized with pyarrow when available
+ARROW_CSV_THRESHOLD = 50_000
+
+
+def _parse_station_file(filepath: str):
+    """
+    Parse a single weather station file. Runs in a worker process.
+    record_date is left as a YYYYMMDD integer; it is converted once after
+    all stations are combined.
+
+    Args:
+        filepath (str): Path to the station .txt file.
+
+    Returns:
+        tuple: (station_df, log_row)
+    """
+    station_name = os.path.splitext(os.path.basename(filepath))[0]
+    start_time = datetime.now()
+
+    # Read file into DataFrame; -9999 marks missing values
+    df = pd.read_csv(
+        filepath,
+        header=None,
+        names=['record_date', 'max_temp', 'min_temp', 'precipitation'],
+        sep='\t',
+        na_values=['-9999'],
+        engine='c',
+    )
+    df['weather_station'] = station_name
+
+    end_time = datetime.now()
+    return df, (start_time, end_time, len(df), station_name)
 
 
 def load_weather_station_data(directory_path: str):
     """
     Reads all weather station .txt files from the specified directory,
-    cleans the data, replaces missing values, converts dates, and logs processing.
+    parses them (-9999 is read as missing), converts readings to nullable
+    integers and dates,
+    and logs processing. Files are parsed in parallel, one task per file.
 
     Args:
         directory_path (str): Path to folder containing weather station files.
 
     Returns:
-        tuple: (weather_station_data_df, weather_station_logs_df)
+        tuple: (weather_station_data_df, weather_station_logs) where the logs are
+            (start_time, end_time, records, weather_station) tuples
     """
-    columns = ['record_date', 'max_temp', 'min_temp', 'precipitation', 'weather_station']
-    logs = []
-    df_list = []
-
-    # Iterate over all txt files in the directory
-    for filepath in glob.glob(os.path.join(directory_path, "*.txt")):
-        station_name = os.path.splitext(os.path.basename(filepath))[0]
-        start_time = datetime.now()
-        
-        # Read file into DataFrame
-        df = pd.read_csv(filepath, header=None, names=columns, delimiter='\t', index_col=False)
-        df['weather_station'] = station_name
+    filepaths = glob.glob(os.path.join(directory_path, "*.txt"))
 
-        # Replace -9999 with NaN
-        df.replace(-9999, np.nan, inplace=True)
+    # Stations are independent, so parse them on all available cores
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        results = list(executor.map(_parse_station_file, filepaths))
 
-        # Convert 'record_date' from YYYYMMDD string to datetime
-        df['record_date'] = pd.to_datetime(df['record_date'].astype(str), format='%Y%m%d')
+    df_list = [df for df, _ in results]
+    logs = [log for _, log in results]
 
-        df_list.append(df)
+    # Combine all station data into a single DataFrame
+    weather_station_data = pd.concat(df_list, ignore_index=True, copy=False)
 
-        # Append log info
-        end_time = datetime.now()
-        logs.append([start_time, end_time, len(df), station_name])
+    # Nullable ints keep missing readings as NULL. Converting once here is much
+    # faster than passing these dtypes to read_csv, which leaves its C fast path.
+    weather_station_data = weather_station_data.astype(
+        {'max_temp': 'Int32', 'min_temp': 'Int32', 'precipitation': 'Int32'}
+    )
 
-    # Combine all station data into a single DataFrame
-    weather_station_data = pd.concat(df_list, ignore_index=True)
+    # Convert 'record_date' from YYYYMMDD integer to datetime in a single call
+    weather_station_data['record_date'] = pd.to_datetime(
+        weather_station_data['record_date'], format='%Y%m%d', cache=True
+    )
 
-    # Create logs DataFrame
-    weather_station_logs = pd.DataFrame(
-        logs,
-        columns=['start_time', 'end_time', 'records', 'weather_station']
+    print(f"Parsed {len(logs)} weather station files.")
+    return weather_station_data, logs
+
+
+def _weather_data_csv(df: pd.DataFrame):
+    """
+    Serialize weather rows into an in-memory CSV buffer for COPY.
+    Large frames go through pyarrow's C++ CSV writer when it is installed,
+    which avoids pandas' per-row Python formatting.
+
+    Args:
+        df (pd.DataFrame): Weather rows to serialize.
+
+    Returns:
+        file-like: CSV buffer positioned at the start, without a header row.
+    """
+    if pa is not None and len(df) > ARROW_CSV_THRESHOLD:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        # record_date is a DATE column; write it without the time part
+        i = table.schema.get_field_index('record_date')
+        table = table.set_column(i, 'record_date', table.column(i).cast(pa.date32()))
+        buffer = io.BytesIO()
+        pacsv.write_csv(table, buffer, pacsv.WriteOptions(include_header=False))
+        buffer.seek(0)
+        return buffer
+    return io.StringIO(df.to_csv(index=False, header=False))
+
+
+def _copy_weather_data(cur, df: pd.DataFrame) -> int:
+    """
+    Bulk-load weather rows with COPY into a temporary staging table, then move
+    them into weather_data, skipping rows that already exist.
+    COPY bypasses per-row SQL parsing, which dominates for large ingests.
+
+    The same statement refreshes weather_stats for every (station, year) that
+    received new rows, so stats never need a separate pass over weather_data.
+    Data-modifying CTEs all see the pre-statement snapshot, so the aggregate
+    combines the existing rows of each touched year with the newly inserted ones.
+
+    Args:
+        cur (psycopg2 cursor): Cursor on the ingestion transaction.
+        df (pd.DataFrame): Weather rows to insert.
+
+    Returns:
+        int: Number of rows actually inserted into weather_data.
+    """
+    columns = ', '.join(df.columns)
+
+    # Staging table lives only until the surrounding transaction commits
+    cur.execute(
+        "CREATE TEMP TABLE weather_data_stage "
+        "(LIKE weather_data INCLUDING DEFAULTS) ON COMMIT DROP"
+    )
+    cur.copy_expert(
+        f"COPY weather_data_stage ({columns}) FROM STDIN WITH (FORMAT csv)",
+        _weather_data_csv(df)
+    )
+
+    cur.execute(
+        f"""
+        WITH inserted AS (
+            INSERT INTO weather_data ({columns})
+            SELECT {columns} FROM weather_data_stage
+            ON CONFLICT (record_date, weather_station) DO NOTHING
+            RETURNING record_date, max_temp, min_temp, precipitation, weather_station
+        ),
+        touched AS (
+            SELECT DISTINCT weather_station, date_trunc('year', record_date)::DATE AS year_start
+            FROM inserted
+        ),
+        affected AS (
+            SELECT w.record_date, w.max_temp, w.min_temp, w.precipitation, w.weather_station
+            FROM weather_data w
+            JOIN touched t
+              ON w.weather_station = t.weather_station
+             AND w.record_date >= t.year_start
+             AND w.record_date < t.year_start + INTERVAL '1 year'
+            UNION ALL
+            SELECT record_date, max_temp, min_temp, precipitation, weather_station
+            FROM inserted
+        ),
+        stats AS (
+            INSERT INTO weather_stats (weather_station, record_year, avg_max_temp, avg_min_temp, avg_precipitation)
+            SELECT
+                weather_station,
+                EXTRACT(YEAR FROM record_date)::SMALLINT as record_year,
+                AVG(max_temp) as avg_max_temp,
+                AVG(min_temp) as avg_min_temp,
+                SUM(precipitation) as avg_precipitation
+            FROM affected
+            WHERE max_temp IS NOT NULL OR min_temp IS NOT NULL OR precipitation IS NOT NULL
+            GROUP BY weather_station, EXTRACT(YEAR FROM record_date)
+            ON CONFLICT (record_year, weather_station)
+            DO UPDATE SET
+                avg_max_temp = EXCLUDED.avg_max_temp,
+                avg_min_temp = EXCLUDED.avg_min_temp,
+                avg_precipitation = EXCLUDED.avg_precipitation
+        )
+        SELECT COUNT(*) FROM inserted
+        """
     )
-    print(weather_station_logs)
-    return weather_station_data, weather_station_logs
+    return cur.fetchone()[0]
 
 
 def insert_dataframe(conn, df: pd.DataFrame, table_name: str, check_duplicates: bool = True) -> bool:
     """
     Inserts a pandas DataFrame into a PostgreSQL table using execute_values for efficiency.
+    weather_data is streamed with COPY instead and also refreshes weather_stats
+    (see _copy_weather_data).
     Handles duplicates by using ON CONFLICT DO NOTHING.
 
     Args:
@@ -74,24 +217,12 @@ def insert_dataframe(conn, df: pd.DataFrame, table_name: str, check_duplicates:
         print(f"No data to insert into {table_name}.")
         return True
 
-    # Convert DataFrame to list of tuples
-    records = list(df.itertuples(index=False, name=None))
-
     # Build column list - use parameterized query to prevent SQL injection
     columns = ', '.join(df.columns)
     placeholders = ', '.join(['%s'] * len(df.columns))
 
     # Prepare SQL query with conflict handling
-    if check_duplicates and table_name == "weather_data":
-        # Use ON CONFLICT for weather_data (has composite primary key)
-        query = sql.SQL(
-            "INSERT INTO {table} ({columns}) VALUES %s "
-            "ON CONFLICT (record_date, weather_station) DO NOTHING"
-        ).format(
-            table=sql.Identifier(table_name),
-            columns=sql.SQL(columns)
-        )
-    elif check_duplicates and table_name == "yield_data":
+    if check_duplicates and table_name == "yield_data":
         # Use ON CONFLICT for yield_data (has single primary key)
         query = sql.SQL(
             "INSERT INTO {table} ({columns}) VALUES %s "
@@ -111,12 +242,19 @@ def insert_dataframe(conn, df: pd.DataFrame, table_name: str, check_duplicates:
 
     try:
         with conn.cursor() as cur:
-            total_records = len(records)
+            total_records = len(df)
             
             # Perform the insert
-            extras.execute_values(cur, query, records, template=None, page_size=1000)
-            rows_inserted = cur.rowcount
+            if check_duplicates and table_name == "weather_data":
+                rows_inserted = _copy_weather_data(cur, df)
+            else:
+                # Stream tuples straight from the DataFrame with a fixed row template
+                records = df.itertuples(index=False, name=None)
+                extras.execute_values(cur, query, records, template=f"({placeholders})", page_size=10000)
+                rows_inserted = cur.rowcount
             conn.commit()
+            # Cached API results may now be stale
+            clear_query_cache()
             
             if check_duplicates:
                 skipped_count = total_records - rows_inserted if rows_inserted >= 0 else 0
@@ -165,10 +303,16 @@ def ingest_weather_data(directory_path: str) -> bool:
         if not success:
             return False
         
-        # Insert logs
-        success = insert_dataframe(conn, logs, "weather_logs", check_duplicates=False)
-        if not success:
-            return False
+        # Insert all station logs with a single multi-row INSERT
+        with conn.cursor() as cur:
+            extras.execute_values(
+                cur,
+                "INSERT INTO weather_logs (start_time, end_time, records, weather_station) VALUES %s",
+                logs,
+                page_size=max(len(logs), 1)
+            )
+        conn.commit()
+        print(f"Data inserted successfully into weather_logs. {len(logs)} records processed.")
         
         ingestion_end_time = datetime.now()
         duration = ingestion_end_time - ingestion_start_time
@@ -272,10 +416,3 @@ if __name__ == "__main__":
         print("Yield data ingestion completed successfully.")
     else:
         print("Yield data ingestion failed.")
-    
-    # Calculate weather stats
-    if weather_success:
-        conn = get_db_connection()
-        from data_modeling import calculate_weather_stats
-        calculate_weather_stats(conn)
-        conn.close()
\ No newline at end of file
@@ -0,0 +1,91 @@
+import os
+import threading
+from psycopg2.pool import ThreadedConnectionPool, PoolError
+
+# Process-wide pool shared by the API query functions.
+# Created lazily so that each gunicorn worker builds its own after fork.
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class BlockingConnectionPool(ThreadedConnectionPool):
+    """
+    ThreadedConnectionPool that waits for a free connection instead of
+    raising PoolError as soon as maxconn connections are checked out.
+    Under gevent workers threading is monkey-patched, so waiting only
+    suspends the current greenlet.
+
+    Connections are opened read-only in autocommit mode: the API never
+    writes, so there is no need to pay for a BEGIN and a ROLLBACK around
+    every query.
+    """
+
+    def __init__(self, minconn, maxconn, *args, timeout: float = 30, **kwargs):
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._timeout = timeout
+        super().__init__(minconn, maxconn, *args, **kwargs)
+        # psycopg2 closes returned connections once minconn of them are idle,
+        # which would reconnect on most requests under load. Only minconn are
+        # opened up front, but every connection is kept once it exists.
+        self.minconn = maxconn
+
+    def _connect(self, key=None):
+        conn = super()._connect(key)
+        conn.set_session(readonly=True, autocommit=True)
+        return conn
+
+    def getconn(self, key=None):
+        if not self._slots.acquire(timeout=self._timeout):
+            raise PoolError("timed out waiting for a database connection")
+        try:
+            return super().getconn(key)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        # Only connections handed out by getconn hold a slot. Releasing one for
+        # anything else would overflow the semaphore and mask psycopg2's PoolError.
+        checked_out = key in self._used if key is not None else id(conn) in self._rused
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            if checked_out:
+                self._slots.release()
+
+
+def reset_pool():
+    """
+    Forget any pool inherited from the parent process and recreate the lock
+    that guards pool creation. Called in each gunicorn worker after gevent
+    has patched threading, so that the lock cooperates with greenlets.
+    """
+    global _pool, _pool_lock
+    _pool = None
+    _pool_lock = threading.Lock()
+
+
+def get_pool() -> BlockingConnectionPool:
+    """
+    Return the process-wide connection pool, creating it on first use.
+    DB_POOL_MIN connections are opened up front and the pool grows up to
+    DB_POOL_MAX; connections are kept open once created.
+
+    Returns:
+        BlockingConnectionPool: Connection pool for API queries
+    """
+    global _pool
+    if _pool is None:
+        # Connecting yields under psycogreen, so concurrent first requests
+        # must not each build (and leak) their own pool
+        with _pool_lock:
+            if _pool is None:
+                # Imported here to avoid a circular import with data_modeling
+                from data_modeling import get_db_config
+                _pool = BlockingConnectionPool(
+                    int(os.getenv('DB_POOL_MIN', '2')),
+                    int(os.getenv('DB_POOL_MAX', '8')),
+                    timeout=float(os.getenv('DB_POOL_TIMEOUT', '30')),
+                    **get_db_config()
+                )
+    return _pool
@@ -1,52 +1,218 @@
 import os
-from flask import Flask, request, jsonify
+import datetime
+import hashlib
+import orjson
+from flask import Flask, Response, g, request, stream_with_context
 from flask_swagger_ui import get_swaggerui_blueprint
+from flask_caching import Cache
+from flask_compress import Compress
 import data_modeling
-import data_wrangling
+
+
+# Weather pages with a larger limit are streamed instead of built in memory
+STREAM_MIN_LIMIT = 1000
+
+# Encoded rows are buffered up to this many bytes per streamed chunk
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Data endpoints answered with an ETag, and how long clients may reuse a response
+ETAG_ENDPOINTS = {'fetch_weather_data', 'fetch_weather_stats', 'fetch_yield_data'}
+ETAG_MAX_AGE = 3600
+
+# Largest page size accepted by /api/weather and by the other endpoints
+WEATHER_MAX_LIMIT = 10000
+MAX_LIMIT = 1000
+
+# Pagination error bodies, encoded once instead of on every 400 response
+_ERR_BAD_INT = orjson.dumps({"error": "offset and limit must be integers"})
+_ERR_OFFSET = orjson.dumps({"error": "offset must be >= 1"})
+_ERR_LIMIT = {
+    max_limit: orjson.dumps({"error": f"limit must be between 1 and {max_limit}"})
+    for max_limit in (WEATHER_MAX_LIMIT, MAX_LIMIT)
+}
+_ERR_YEAR = orjson.dumps({"error": "year must be an integer"})
+_ERR_CURSOR = orjson.dumps({"error": "after must be in YYYY-MM-DD|STATION format"})
+
+
+def _weather_cursor(row) -> str:
+    """
+    Keyset cursor pointing after a weather row, in the "YYYY-MM-DD|STATION"
+    format accepted by the `after` parameter. Follows the
+    (record_date, weather_station) ordering of the weather query.
+    """
+    return f"{row['record_date'].isoformat()}|{row['weather_station']}"
+
+
+def _parse_weather_cursor(token: str):
+    """
+    Split an `after` cursor into (record_date, weather_station).
+
+    Raises:
+        ValueError: If the token is not in "YYYY-MM-DD|STATION" format
+    """
+    after_date, sep, after_station = token.partition("|")
+    if not sep or not after_station:
+        raise ValueError("after must be in YYYY-MM-DD|STATION format")
+    datetime.date.fromisoformat(after_date)
+    return after_date, after_station
+
+
+def _stream_page(rows, offset: int, limit: int):
+    """
+    Incrementally encode a page of weather rows as
+    {"data": [...], "count": ..., "offset": ..., "limit": ..., "next_cursor": ...}.
+    Rows are serialized with orjson and yielded in chunks of about
+    STREAM_CHUNK_SIZE bytes, so the full page is never held in memory.
+    """
+    count = 0
+    last = None
+    chunk = bytearray(b'{"data":[')
+    for row in rows:
+        if count:
+            chunk += b','
+        chunk += orjson.dumps(row)
+        count += 1
+        last = row
+        if len(chunk) >= STREAM_CHUNK_SIZE:
+            yield bytes(chunk)
+            chunk.clear()
+    # A short page is the last one; a full page may have more after it
+    next_cursor = _weather_cursor(last) if count == limit else None
+    chunk += b'],"count":%d,"offset":%d,"limit":%d,"next_cursor":%s}' % (
+        count, offset, limit, orjson.dumps(next_cursor))
+    yield bytes(chunk)
+
+
+def json_response(payload, status: int = 200) -> Response:
+    """
+    Serialize a payload with orjson (much faster than the stdlib json used
+    by jsonify on float-heavy data) and wrap it in a JSON response.
+    """
+    body = orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+    return Response(body, status=status, mimetype='application/json')
+
+
+def _paging(default_limit: int, max_limit: int):
+    """
+    Parse and validate the offset/limit query parameters of the current request.
+    Unlike args.get(type=int), a non-integer value is rejected instead of
+    silently replaced by the default.
+
+    Args:
+        default_limit (int): Page size used when limit is not given
+        max_limit (int): Largest accepted page size (a key of _ERR_LIMIT)
+
+    Returns:
+        tuple: ((offset, limit), None) if valid, otherwise (None, 400 response)
+    """
+    args = request.args
+    try:
+        offset = int(args.get("offset", 1))
+        limit = int(args.get("limit", default_limit))
+    except ValueError:
+        return None, Response(_ERR_BAD_INT, status=400, mimetype='application/json')
+    if offset < 1:
+        return None, Response(_ERR_OFFSET, status=400, mimetype='application/json')
+    if limit < 1 or limit > max_limit:
+        return None, Response(_ERR_LIMIT[max_limit], status=400, mimetype='application/json')
+    return (offset, limit), None
+
+
+def _year_filter():
+    """
+    Parse the optional year filter of the current request. As in _paging,
+    a non-integer value is rejected instead of silently dropping the filter.
+
+    Returns:
+        tuple: (year, None) if valid (0 when not given), otherwise (None, 400 response)
+    """
+    try:
+        return int(request.args.get("year", 0)), None
+    except ValueError:
+        return None, Response(_ERR_YEAR, status=400, mimetype='application/json')
+
+
+def _request_etag() -> str:
+    """
+    ETag for the current request: a hash of the full path (including the
+    query string) and the version of the ingested data, so it changes
+    whenever new data is loaded.
+    """
+    key = f"{request.full_path}|{data_modeling.ingest_version}"
+    return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+
+def _is_cacheable(response) -> bool:
+    """
+    Only cache successful responses that returned data. Database errors are
+    reported by data_modeling as empty results, so empty pages are not cached
+    either. Streamed responses cannot be cached.
+    The view records whether it found data in g.has_data, so the body is
+    never decoded here.
+    """
+    if response.is_streamed:
+        return False
+    return response.status_code == 200 and g.get('has_data', False)
+
 
 def create_app():
     """
     Create and configure the Flask application with all API endpoints.
+    Tables and data are set up separately by bootstrap.py.
     
     Returns:
         Flask app instance
     """
     app = Flask(__name__)
 
-    try:
-        conn = data_modeling.get_db_connection()
-        data_modeling.initialize_tables(conn)
-        
-        # Get the directory where this file is located (src directory)
-        src_dir = os.path.dirname(os.path.abspath(__file__))
-        src_dir = os.path.dirname(src_dir)
-        
-        # Ingest weather data
-        wx_data_path = os.path.join(src_dir, "wx_data")
-        weather_success = data_wrangling.ingest_weather_data(wx_data_path)
-        if weather_success:
-            print("Weather data ingestion completed successfully.")
-        else:
-            print("Weather data ingestion failed.")
-        
-        # Ingest yield data
-        yld_data_path = os.path.join(src_dir, "yld_data", "US_corn_grain_yield.txt")
-        yield_success = data_wrangling.ingest_yield_data(yld_data_path)
-        if yield_success:
-            print("Yield data ingestion completed successfully.")
-        else:
-            print("Yield data ingestion failed.")
-        
-        # Calculate weather stats
-        if weather_success:
-            data_modeling.calculate_weather_stats(conn)
-            conn.close()
-    except Exception as e:
-        print(f"Error: {e}")
-    
     # Configure Flask based on environment
     app.config['DEBUG'] = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
+
+    # Response cache for the read-only endpoints; data only changes on ingestion.
+    # Set CACHE_TYPE=RedisCache and CACHE_REDIS_URL to share it across workers.
+    cache = Cache(app, config={
+        'CACHE_TYPE': os.getenv('CACHE_TYPE', 'SimpleCache'),
+        'CACHE_DEFAULT_TIMEOUT': int(os.getenv('CACHE_DEFAULT_TIMEOUT', '86400')),
+        'CACHE_REDIS_URL': os.getenv('CACHE_REDIS_URL'),
+    })
     
+    # Compress JSON bodies, brotli preferred with gzip as fallback. Pages are mostly
+    # repeated station IDs and small floats, so they shrink several-fold.
+    # Drop this if a reverse proxy in front of gunicorn already compresses.
+    app.config['COMPRESS_MIMETYPES'] = ['application/json']
+    app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+    app.config['COMPRESS_ALGORITHM_STREAMING'] = ['br', 'deflate']
+    app.config['COMPRESS_LEVEL'] = 4
+    app.config['COMPRESS_BR_LEVEL'] = 4
+    app.config['COMPRESS_MIN_SIZE'] = 1024
+    Compress(app)
+    
+    @app.before_request
+    def check_etag():
+        """
+        Answer If-None-Match requests whose data has not changed with an
+        empty 304, before the response cache or the database are touched.
+        """
+        if request.endpoint in ETAG_ENDPOINTS:
+            if request.if_none_match.contains_weak(_request_etag()):
+                return Response(status=304)
+
+    @app.after_request
+    def set_etag(response):
+        """
+        Tag data responses with an ETag and let clients reuse them for ETAG_MAX_AGE.
+        The ETag is weak so that Flask-Compress leaves it unchanged for every encoding.
+        Empty pages are skipped since they may stand for a database error.
+        """
+        if request.endpoint not in ETAG_ENDPOINTS:
+            return response
+        # g.has_data is unset on a Flask-Caching hit; only pages with data are cached
+        has_data = response.status_code == 200 and g.get('has_data', True)
+        if has_data or response.status_code == 304:
+            response.set_etag(_request_etag(), weak=True)
+            response.cache_control.max_age = ETAG_MAX_AGE
+        return response
+
     # Swagger/OpenAPI configuration
     SWAGGER_URL = '/api/docs'
     API_URL = '/static/swagger.json'
@@ -66,6 +232,7 @@ def create_app():
     
 
     @app.route('/api/weather', methods=['GET'])
+    @cache.cached(query_string=True, response_filter=_is_cacheable)
     def fetch_weather_data():
         """
         GET /api/weather
@@ -76,34 +243,58 @@ def create_app():
             date (str, optional): Filter by date in YYYY-MM-DD format
             offset (int, optional): Page number (1-indexed, default: 1)
             limit (int, optional): Records per page (default: 1000)
+            after (str, optional): Keyset cursor "YYYY-MM-DD|STATION" from a previous
+                page's next_cursor; when given, offset is ignored
         
         Returns:
-            JSON array of weather records with temperatures in Celsius and precipitation in cm
+            JSON array of weather records with temperatures in Celsius and precipitation in cm,
+            plus next_cursor for fetching the following page (null on the last page).
+            Pages larger than STREAM_MIN_LIMIT are streamed and not cached.
         """
         try:
             args = request.args
             station_id = args.get("station_id", "", type=str)
             date_val = args.get("date", "", type=str)
-            offset = args.get("offset", 1, type=int)
-            limit = args.get("limit", 1000, type=int)
+            after = args.get("after", "", type=str)
+
+            paging, error = _paging(1000, WEATHER_MAX_LIMIT)
+            if error is not None:
+                return error
+            offset, limit = paging
 
-            # Validate inputs
-            if offset < 1:
-                return jsonify({"error": "offset must be >= 1"}), 400
-            if limit < 1 or limit > 10000:
-                return jsonify({"error": "limit must be between 1 and 10000"}), 400
+            after_date, after_station = "", ""
+            if after:
+                try:
+                    after_date, after_station = _parse_weather_cursor(after)
+                except ValueError:
+                    return Response(_ERR_CURSOR, status=400, mimetype='application/json')
 
-            records = data_modeling.get_weather_data(station_id, date_val, offset, limit)
-            return jsonify({
+            if limit > STREAM_MIN_LIMIT:
+                # Large pages are encoded row by row straight from a server-side cursor
+                rows = data_modeling.get_weather_data(station_id, date_val, offset, limit,
+                                                      after_date, after_station, stream=True)
+                # A failed query comes back as an empty list instead of an open cursor
+                g.has_data = not isinstance(rows, list)
+                return Response(
+                    stream_with_context(_stream_page(rows, offset, limit)),
+                    mimetype='application/json'
+                )
+
+            records = data_modeling.get_weather_data(station_id, date_val, offset, limit,
+                                                     after_date, after_station)
+            g.has_data = bool(records)
+            return json_response({
                 "data": records,
                 "count": len(records),
                 "offset": offset,
-                "limit": limit
+                "limit": limit,
+                "next_cursor": _weather_cursor(records[-1]) if len(records) == limit else None
             })
         except Exception as e:
-            return jsonify({"error": str(e)}), 500
+            return json_response({"error": str(e)}, 500)
 
     @app.route('/api/yield', methods=['GET'])
+    @cache.cached(query_string=True, response_filter=_is_cacheable)
     def fetch_yield_data():
         """
         GET /api/yield
@@ -118,28 +309,28 @@ def create_app():
             JSON array of yield records
         """
         try:
-            args = request.args
-            year_val = args.get("year", 0, type=int)
-            offset = args.get("offset", 1, type=int)
-            limit = args.get("limit", 5, type=int)
+            year_val, error = _year_filter()
+            if error is not None:
+                return error
 
-            # Validate inputs
-            if offset < 1:
-                return jsonify({"error": "offset must be >= 1"}), 400
-            if limit < 1 or limit > 1000:
-                return jsonify({"error": "limit must be between 1 and 1000"}), 400
+            paging, error = _paging(5, MAX_LIMIT)
+            if error is not None:
+                return error
+            offset, limit = paging
 
             records = data_modeling.get_yield_data(year_val, offset, limit)
-            return jsonify({
+            g.has_data = bool(records)
+            return json_response({
                 "data": records,
                 "count": len(records),
                 "offset": offset,
                 "limit": limit
             })
         except Exception as e:
-            return jsonify({"error": str(e)}), 500
+            return json_response({"error": str(e)}, 500)
 
     @app.route('/api/weather/stats', methods=['GET'])
+    @cache.cached(query_string=True, response_filter=_is_cacheable)
     def fetch_weather_stats():
         """
         GET /api/weather/stats
@@ -157,37 +348,33 @@ def create_app():
         try:
             args = request.args
             station_id = args.get("station_id", "", type=str)
-            year_val = args.get("year", 0, type=int)
-            offset = args.get("offset", 1, type=int)
-            limit = args.get("limit", 500, type=int)
+            year_val, error = _year_filter()
+            if error is not None:
+                return error
 
-            # Validate inputs
-            if offset < 1:
-                return jsonify({"error": "offset must be >= 1"}), 400
-            if limit < 1 or limit > 1000:
-                return jsonify({"error": "limit must be between 1 and 1000"}), 400
+            paging, error = _paging(500, MAX_LIMIT)
+            if error is not None:
+                return error
+            offset, limit = paging
 
             records = data_modeling.get_weather_stats(station_id, year_val, offset, limit)
-            return jsonify({
+            g.has_data = bool(records)
+            return json_response({
                 "data": records,
                 "count": len(records),
                 "offset": offset,
                 "limit": limit
             })
         except Exception as e:
-            return jsonify({"error": str(e)}), 500
+            return json_response({"error": str(e)}, 500)
 
     @app.route('/health', methods=['GET'])
     def health_check():
         """Health check endpoint."""
-        return jsonify({"status": "healthy"}), 200
+        return json_response({"status": "healthy"}, 200)
 
     return app
 
 
 # Create app instance for gunicorn
 app = create_app()
-
-if __name__ == "__main__":
-    port = int(os.getenv('PORT', 8081))
-    app.run(host='0.0.0.0', port=port, debug=app.config['DEBUG'])
@@ -1,15 +1,21 @@
+import datetime
 import unittest
+from unittest import mock
+from psycopg2.pool import PoolError
 from server import create_app
+from db_pool import BlockingConnectionPool
 import data_modeling
 
 
 class TestWeatherAPI(unittest.TestCase):
     """Unit tests for the Weather API."""
 
-    def setUp(self):
-        """Set up test client."""
-        self.app = create_app()
-        self.client = self.app.test_client()
+    @classmethod
+    def setUpClass(cls):
+        """Create one app and test client shared by all tests."""
+        cls.app = create_app()
+        cls.app.config['TESTING'] = True
+        cls.client = cls.app.test_client()
 
     def test_health_endpoint(self):
         """Test health check endpoint."""
@@ -26,6 +32,107 @@ class TestWeatherAPI(unittest.TestCase):
         self.assertIn('data', data)
         self.assertIn('count', data)
 
+    def test_weather_endpoint_streamed(self):
+        """Test that large weather pages are streamed as valid JSON."""
+        response = self.client.get('/api/weather?limit=5000')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        data = response.get_json()
+        self.assertIn('data', data)
+        self.assertEqual(data['count'], len(data['data']))
+        self.assertEqual(data['limit'], 5000)
+
+    def test_weather_endpoint_keyset(self):
+        """Test that the after cursor is passed through and next_cursor points at the last row."""
+        rows = [
+            {"record_date": datetime.date(2020, 1, 16), "max_temp": 7.2, "min_temp": -1.1,
+             "precipitation": 0.5, "weather_station": "USC00112140"},
+            {"record_date": datetime.date(2020, 1, 16), "max_temp": 6.1, "min_temp": -2.0,
+             "precipitation": 0.0, "weather_station": "USC00112141"},
+        ]
+        with mock.patch('data_modeling.get_weather_data', return_value=rows) as fetch:
+            # Full page: more rows may follow
+            response = self.client.get('/api/weather?limit=2&offset=3&after=2020-01-15|USC00112140')
+            self.assertEqual(response.status_code, 200)
+            fetch.assert_called_once_with("", "", 3, 2, "2020-01-15", "USC00112140")
+            self.assertEqual(response.get_json()['next_cursor'], "2020-01-16|USC00112141")
+
+            # Short page: this was the last one
+            response = self.client.get('/api/weather?limit=3&after=2020-01-15|USC00112140')
+            self.assertIsNone(response.get_json()['next_cursor'])
+
+    def test_query_cache_skips_large_pages(self):
+        """Test that only small pages are kept in the in-process query cache."""
+        data_modeling.clear_query_cache()
+        with mock.patch('data_modeling._run_query', return_value=()) as query:
+            for _ in range(2):
+                data_modeling.get_weather_stats(limit=10)
+            self.assertEqual(query.call_count, 1)
+            for _ in range(2):
+                data_modeling.get_weather_stats(limit=500)
+            self.assertEqual(query.call_count, 3)
+        data_modeling.clear_query_cache()
+
+    def test_get_weather_data_keyset_ignores_offset(self):
+        """Test that keyset pagination replaces OFFSET in the weather query."""
+        with mock.patch('data_modeling._cached_query', return_value=()) as query:
+            data_modeling.get_weather_data(offset=5, limit=10,
+                                           after_date="2020-01-15", after_station="USC00112140")
+        sql, params = query.call_args.args
+        self.assertNotIn("OFFSET", sql)
+        self.assertIn("(record_date, weather_station) >", sql)
+        self.assertEqual(params, ("2020-01-15", "USC00112140", 10))
+
+    def test_weather_endpoint_invalid_cursor(self):
+        """Test that a malformed after cursor is rejected."""
+        response = self.client.get('/api/weather?after=USC00112140')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.get_json())
+
+    def test_invalid_query_params(self):
+        """Test that non-integer or out-of-range offset/limit/year values are rejected."""
+        for url in ('/api/weather?limit=abc', '/api/weather?offset=0',
+                    '/api/weather/stats?limit=5000', '/api/yield?offset=1.5',
+                    '/api/weather/stats?year=abc', '/api/yield?year=abc'):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 400, url)
+            self.assertIn('error', response.get_json())
+
+    def test_response_compression(self):
+        """Test that large JSON responses are brotli-compressed when accepted."""
+        response = self.client.get('/static/swagger.json', headers={'Accept-Encoding': 'br, gzip'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers.get('Content-Encoding'), 'br')
+
+    def test_weather_endpoint_not_modified(self):
+        """Test that a matching If-None-Match is answered with an empty 304."""
+        rows = [{"record_date": datetime.date(2020, 1, 15), "max_temp": 5.5, "min_temp": -2.3,
+                 "precipitation": 0.0, "weather_station": "USC00112140"}]
+        url = '/api/weather?station_id=USC00112140&limit=10'
+        with mock.patch('data_modeling.get_weather_data', return_value=rows):
+            response = self.client.get(url)
+        etag = response.headers.get('ETag')
+        self.assertIsNotNone(etag)
+        self.assertIn('max-age', response.headers.get('Cache-Control', ''))
+
+        # Served from the response cache; still tagged
+        response = self.client.get(url)
+        self.assertEqual(response.headers.get('ETag'), etag)
+
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+        self.assertEqual(response.headers.get('ETag'), etag)
+
+    def test_weather_endpoint_failed_stream_not_tagged(self):
+        """Test that a streamed page whose query failed gets no ETag."""
+        with mock.patch('data_modeling.get_weather_data', return_value=[]):
+            response = self.client.get('/api/weather?limit=5000&station_id=USC00000000')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.get_json()['count'], 0)
+        self.assertIsNone(response.headers.get('ETag'))
+        self.assertIsNone(response.cache_control.max_age)
+
     def test_weather_stats_endpoint(self):
         """Test weather stats endpoint."""
         response = self.client.get('/api/weather/stats?limit=10')
@@ -41,5 +148,15 @@ class TestWeatherAPI(unittest.TestCase):
         self.assertIn('data', data)
 
 
+class TestConnectionPool(unittest.TestCase):
+    """Unit tests for the API connection pool."""
+
+    def test_putconn_unknown_connection(self):
+        """Test that returning a foreign connection raises PoolError, not a semaphore error."""
+        pool = BlockingConnectionPool(0, 2)
+        with self.assertRaises(PoolError):
+            pool.putconn(object())
+
+
 if __name__ == '__main__':
     unittest.main()